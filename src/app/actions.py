@@ -1,38 +1,39 @@
-import re
-from datetime import datetime
-from zoneinfo import ZoneInfo
+import sys
+from types import MappingProxyType
 
-from django.conf import settings
 from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import path, reverse  # , Resolver404, get_resolver
+from django.utils import timezone
 
 from .models import Item
+from .stats import invalidate_dash_stats
 
-# Registry to store action functions
-_action_registry = {}
-
-# # Registry to store action URL patterns
-# _action_urlpatterns = []
+# Registry to store action functions.  Only the action decorator writes to _actions; everything else reads
+# through the read-only _action_registry view.
+_actions = {}
+_action_registry = MappingProxyType(_actions)
+# Bound once here rather than looking up the method on every request
+_lookup_action = _action_registry.get
 
 
 def action(func):
     """Decorator to mark a function as an action and register it."""
-    action_name = func.__name__.lower()
-    _action_registry[action_name] = func
+    # Interned, so a lookup with an interned copy of the name matches by identity before comparing strings
+    action_name = sys.intern(func.__name__.lower())
+    _actions[action_name] = func
 
     return func
 
 
 def handle_action(request, pk, action):
     """Handle an action for a specific item."""
-    action_name = action.lower()
-    action_func = _action_registry.get(action_name)
+    # The URL pattern only accepts lowercase action names, so no normalisation is needed here.
+    action_func = _lookup_action(action)
     if action_func:
         return action_func(request, pk)
     else:
-        return HttpResponse(f"Action '{action_name}' not found", status=404)
+        return HttpResponse(f"Action '{action}' not found", status=404)
 
 
 @action
@@ -65,12 +66,21 @@ def move(request, pk):
             return render(request, 'app/move.html', context)
 
         with transaction.atomic():
-            destination_item.last_scanned_at = datetime.now(ZoneInfo('UTC'))
-            destination_item.save()
+            now = timezone.now()
+            destination_item.last_scanned_at = now
+            destination_item.last_updated_at = now
 
             src_item.previously_in = src_item.parent
             src_item.parent = destination_item
-            src_item.save()
+            src_item.last_updated_at = now
+
+            # Write both items in one UPDATE.  bulk_update() skips auto_now, hence last_updated_at above.
+            Item.objects.bulk_update(
+                [src_item, destination_item],
+                fields=['parent', 'previously_in', 'last_scanned_at', 'last_updated_at'],
+            )
+            Item.refresh_container_flags([src_item.previously_in_id, destination_item.id])
+            invalidate_dash_stats()
 
             # FIXME: Create an ItemHistory record for the move.
 
@@ -89,7 +99,7 @@ def move_container_options(request, pk):
     barcode_input = request.GET.get('barcode_input', '').strip()
 
     # Get IDs of all children items
-    our_children = [child.id for child in item.get_all_children()]
+    our_children = Item.descendant_ids(item.id)
 
     # Get all items that can hold items (excluding the current item and its descendants)
     items = Item.objects.filter(deleted=False)
@@ -101,10 +111,10 @@ def move_container_options(request, pk):
 
     # Filter to only containers if requested
     if not show_all:
-        items = items.filter(children__isnull=False).distinct()
+        items = items.filter(is_container=True)
 
     # Sort items by path
-    items = sorted(items, key=lambda c: c.path)
+    items = Item.order_by_path(items)
 
     context = {
         'item': item,
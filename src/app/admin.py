@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.http import HttpResponseRedirect
 from django.urls import reverse
 from django.utils.html import format_html
@@ -24,14 +25,28 @@ class ExternalBarcodeInline(admin.TabularInline):
     admin_link.short_description = "Admin"
 
 
+class ItemChangeList(ChangeList):
+    """Changelist that only fetches the columns the item list shows (str(parent) needs its name and deleted flag)"""
+
+    list_columns = ['id', 'name', 'parent', 'deleted', 'created_at', 'parent__name', 'parent__deleted']
+
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).only(*self.list_columns)
+
+
 @admin.register(Item)
 class ItemAdmin(admin.ModelAdmin):
     list_display = ['id', 'barcode_string', 'name', 'parent', 'deleted', 'created_at']
+    list_select_related = ['parent']
     list_filter = ['deleted', 'created_at']
     search_fields = ['name', 'description']
     readonly_fields = ['created_at', 'last_updated_at']
     inlines = [ExternalBarcodeInline]
 
+    def get_changelist(self, request, **kwargs):
+        # Restrict columns on the changelist only; the change form needs the whole row.
+        return ItemChangeList
+
     def save_model(self, request, obj, form, change):
         """Override save_model to set custom ID if provided in query parameter"""
         if not change and 'id' in request.GET:  # Only for new objects, not edits
@@ -50,7 +65,7 @@ class ItemAdmin(admin.ModelAdmin):
         """Override response_add to handle redirect after adding with specific ID"""
         if '_addanother' in request.POST:
             # If "Save and add another" was clicked, redirect back to add page with same ID
-            return HttpResponseRedirect(reverse('admin:app_item_add') + f'?id={obj.id}')
+            return HttpResponseRedirect(reverse('admin:app_item_add', query={'id': obj.id}))
         elif '_continue' in request.POST:
             # If "Save and continue editing" was clicked, redirect to change page
             return HttpResponseRedirect(reverse('admin:app_item_change', args=[obj.id]))
@@ -0,0 +1,168 @@
+"""
+Import of items from tab-separated text with ID, In, Name and Desc columns.  Used by the import page and by
+the import_items management command, which can load large files without tying up a web worker.
+"""
+
+import csv
+import logging
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Item
+from .stats import invalidate_dash_stats
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000  # CSV rows validated and written per round trip
+REQUIRED_HEADERS = ('ID', 'In', 'Name', 'Desc')
+
+
+class MissingHeadersError(ValueError):
+    """The header line doesn't name all of the required columns"""
+
+
+def import_items(lines, save=False):
+    """
+    Validates the rows read from lines (any iterable of text lines, such as an open file) and, if save is true
+    and every row is valid, inserts or updates the items.  Rows are handled in batches so that, when saving,
+    only one batch of Item instances is held in memory at a time.
+
+    Returns a dict with:
+      errors: a list of messages for invalid rows; nothing is saved if there are any
+      validated_items: the validated rows as dicts of model fields (only kept when not saving, for previews)
+      stats: counts of total, root and child items
+      imported_count, updated_count: how many items were saved, and how many of those already existed
+
+    Raises MissingHeadersError if a required column is missing.
+    """
+    reader = csv.reader(lines, delimiter='\t')
+    header = next(reader, [])
+
+    # Validate headers
+    missing_headers = set(REQUIRED_HEADERS) - set(header)
+    if missing_headers:
+        raise MissingHeadersError(f"Missing required headers: {', '.join(sorted(missing_headers))}")
+
+    validated_items = []
+    errors = []
+    last_parent = None
+    total_items = 0
+    root_items = 0
+    child_items = 0
+    imported_count = 0
+    updated_count = 0
+    csv_ids = set()  # IDs of the rows seen so far
+    missing_parents = {}  # Parent IDs not (yet) found, with the line that first referred to each
+    # Rows are unpacked by position rather than built into a dict per row
+    id_col, in_col, name_col, desc_col = (header.index(h) for h in REQUIRED_HEADERS)
+    min_width = max(id_col, in_col, name_col, desc_col) + 1
+    # Number rows by the line they ended on, skipping blank lines as DictReader did
+    numbered_rows = ((reader.line_num, row) for row in reader if row)
+
+    with transaction.atomic():
+        while batch := list(islice(numbered_rows, IMPORT_BATCH_SIZE)):
+            to_upsert = {}
+            parent_lines = {}
+            for n, row in batch:
+                logger.debug('row=%r', row)
+
+                if len(row) < min_width:
+                    row += [''] * (min_width - len(row))  # Missing trailing cells are empty
+
+                name = row[name_col].strip()
+                if not name:
+                    continue  # Skip rows without a name
+
+                # Determine parent based on 'In' field
+                in_field = row[in_col].strip()
+                parent = None
+                if in_field == '-root-':
+                    parent = None
+                    last_parent = None
+                elif in_field.isdigit():
+                    parent = in_field
+                    last_parent = parent
+                    parent_lines.setdefault(parent, n)
+                elif not in_field:
+                    parent = last_parent
+                else:
+                    errors.append(f"Line {n}: Invalid 'In' field value: {in_field}")
+                    continue
+
+                # Map CSV fields to model fields
+                data = {
+                    'id': row[id_col].strip(),
+                    'name': name,
+                    'description': row[desc_col].strip(),
+                    'parent_id': parent,
+                }
+
+                csv_ids.add(data['id'])
+                total_items += 1
+                if parent:
+                    child_items += 1
+                else:
+                    root_items += 1
+
+                if not save:
+                    # Keep the rows for the preview
+                    validated_items.append(data)
+                elif not errors:
+                    # Later rows with the same ID replace earlier ones, as they did when saved one by one
+                    to_upsert[data['id']] = Item(**data)
+
+            # Look up this batch's IDs and the parents it refers to in one query, then classify them in Python.
+            # The current parents of rows being updated are kept too, as moving a row away may empty them.
+            lookup_ids = {i for i in to_upsert if i.isdigit()} | parent_lines.keys()
+            existing_ids = set()
+            old_parent_ids = set()
+            if lookup_ids:
+                for pk, parent_id in Item.objects.filter(pk__in=lookup_ids).values_list('pk', 'parent_id'):
+                    existing_ids.add(str(pk))
+                    if str(pk) in to_upsert and parent_id is not None:
+                        old_parent_ids.add(str(parent_id))
+            for parent_id, n in parent_lines.items():
+                if parent_id not in existing_ids and parent_id not in csv_ids:
+                    # May yet be defined by a later row
+                    missing_parents.setdefault(parent_id, n)
+
+            if to_upsert and not errors:
+                # Count the rows that will update existing items, for the summary message
+                updated_count += len(existing_ids.intersection(to_upsert))
+                # Insert new items and update existing ones in a single upsert per batch
+                Item.objects.bulk_create(
+                    to_upsert.values(),
+                    update_conflicts=True,
+                    unique_fields=['id'],
+                    update_fields=['name', 'description', 'parent', 'last_updated_at'],
+                )
+                imported_count += len(to_upsert)
+                # Only the rows' new and old parents can have gained or lost children.  The rows themselves are
+                # refreshed too: a row may be the parent of rows in an earlier batch, which couldn't flag it then.
+                Item.refresh_container_flags(
+                    {item.parent_id for item in to_upsert.values()} | old_parent_ids | to_upsert.keys()
+                )
+
+        for parent_id, n in missing_parents.items():
+            if parent_id not in csv_ids:
+                errors.append(f"Line {n}: Parent item {parent_id} does not exist")
+
+        if errors:
+            # Undo any batches written before the first error
+            transaction.set_rollback(True)
+            imported_count = updated_count = 0
+        elif imported_count:
+            invalidate_dash_stats()
+
+    return {
+        'errors': errors,
+        'validated_items': validated_items,
+        'stats': {
+            'total_items': total_items,
+            'root_items': root_items,
+            'child_items': child_items,
+        },
+        'imported_count': imported_count,
+        'updated_count': updated_count,
+    }
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import items from a tab-separated file with ID, In, Name and Desc columns, as on the import page.  "
+        "Use this for files too large to paste into the page.  The dashboard counts are cached per process, so "
+        "a running web server may show the old counts for up to DASH_STATS_CACHE_TIMEOUT seconds afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Tab-separated file to import")
+        parser.add_argument('--dry-run', action='store_true', help="Validate the file without saving anything")
+
+    def handle(self, *args, **options):
+        try:
+            # newline='' lets the csv module handle line endings inside quoted cells
+            with open(options['path'], newline='', encoding='utf-8') as lines:
+                result = importer.import_items(lines, save=not options['dry_run'])
+        except (OSError, importer.MissingHeadersError) as e:
+            raise CommandError(e)
+
+        if result['errors']:
+            raise CommandError("Nothing was imported:\n" + "\n".join(result['errors']))
+
+        stats = result['stats']
+        self.stdout.write(
+            f"{stats['total_items']} valid items ({stats['root_items']} root, {stats['child_items']} child)"
+        )
+        if not options['dry_run']:
+            imported_count = result['imported_count']
+            updated_count = result['updated_count']
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Imported {imported_count} items ({imported_count - updated_count} new, {updated_count} updated)"
+                )
+            )
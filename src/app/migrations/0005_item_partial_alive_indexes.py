@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-15 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0004_item_previously_in"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="item",
+            name="app_item_deleted_78c334_idx",
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("deleted", False)),
+                fields=["parent"],
+                name="item_parent_alive_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("deleted", False)),
+                fields=["id"],
+                name="item_alive_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-15 11:05
+
+from django.db import migrations, models
+
+
+def populate_is_container(apps, schema_editor):
+    Item = apps.get_model("app", "Item")
+    Item.objects.update(
+        is_container=models.Exists(
+            Item.objects.filter(parent_id=models.OuterRef("pk"), deleted=False)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0005_item_partial_alive_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="item",
+            name="is_container",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="Whether this item contains other (non-deleted) items",
+            ),
+        ),
+        migrations.RunPython(populate_is_container, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="item",
+            index=models.Index(
+                condition=models.Q(("deleted", False), ("is_container", True)),
+                fields=["id"],
+                name="item_alive_container_idx",
+            ),
+        ),
+    ]
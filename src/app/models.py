@@ -2,9 +2,12 @@ import re
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connection, models
 from django.utils import timezone
 
+UPC_RE = re.compile(r'^\d{12,13}$')
+PATH_SORT_SEPARATOR = '\x01'  # Joins names in path sort keys; sorts before every printable character
+
 
 class Item(models.Model):
     """
@@ -18,20 +21,40 @@ class Item(models.Model):
         Attempt to find an Item from an internal barcode string.
         Returns the Item if found, None otherwise.
         """
-        match = re.match(f"^{re.escape(settings.BARCODE_PREFIX)}(\\d+)$", barcode_string)
-        if match:
-            try:
-                return Item.objects.get(id=match.group(1), deleted=False)
-            except Item.DoesNotExist:
-                pass
+        item_id = Item.get_possible_item_id_from_internal_barcode(barcode_string)
+        if item_id:
+            return Item.from_internal_id(item_id)
 
         return None
 
+    @staticmethod
+    def from_internal_id(item_id):
+        """Returns the non-deleted Item with the id parsed from an internal barcode, or None"""
+        return Item.objects.filter(id=item_id, deleted=False).first()
+
+    @staticmethod
+    def from_external_barcode(barcode_string):
+        """
+        Returns the Item with the given external barcode, or None.  This will fail if more than one item
+        shares the barcode.  The join uses the index on ExternalBarcode.code.
+        """
+        try:
+            return Item.objects.get(external_barcodes__code=barcode_string)
+        except Item.DoesNotExist:
+            return None
+
     @staticmethod
     def get_possible_item_id_from_internal_barcode(barcode_string):
-        match = re.match(f"^{re.escape(settings.BARCODE_PREFIX)}(\\d+)$", barcode_string)
-        if match:
-            return match.group(1)
+        """
+        Returns the item id (as a string) if barcode_string is in our internal format, None otherwise.
+        Internal barcodes are a fixed prefix followed by digits, so plain string checks will do.
+        """
+        prefix = settings.BARCODE_PREFIX
+        if barcode_string.startswith(prefix):
+            item_id = barcode_string[len(prefix) :]
+            # isdecimal() matches the same characters as the regex \d
+            if item_id.isdecimal():
+                return item_id
         return None
 
     @staticmethod
@@ -41,19 +64,12 @@ class Item(models.Model):
         Returns the Item if found, None otherwise.  This will fail if more than
         one item shares the same external barcode.
         """
-        # Try internal barcode first
-        item = Item.from_barcode(barcode_string)
-        if item:
-            return item
-
-        # Try external barcodes
-        try:
-            external_barcode = ExternalBarcode.objects.get(code=barcode_string)
-            return external_barcode.item
-        except ExternalBarcode.DoesNotExist:
-            pass
-
-        return None
+        # A code in our internal format is only ever looked up by id; anything else by external barcode.
+        # Either way that's one query.
+        item_id = Item.get_possible_item_id_from_internal_barcode(barcode_string)
+        if item_id:
+            return Item.from_internal_id(item_id)
+        return Item.from_external_barcode(barcode_string)
 
     name = models.CharField(max_length=255, help_text="Common name for the item")
     description = models.TextField(blank=True, help_text="Additional details about the item")
@@ -68,6 +84,11 @@ class Item(models.Model):
         related_name='children',
         help_text="The item that this item is stored in",
     )
+    # Denormalised from the children, so container lists and counts don't need a subquery per item.
+    # Kept up to date by refresh_container_flags(), which the save/delete signals and bulk writers call.
+    is_container = models.BooleanField(
+        default=False, editable=False, help_text="Whether this item contains other (non-deleted) items"
+    )
 
     # Previous Location
     previously_in = models.ForeignKey(
@@ -101,7 +122,13 @@ class Item(models.Model):
 
     class Meta:
         indexes = [
-            models.Index(fields=['deleted', 'parent']),
+            # Partial indexes over live items only; nearly every query filters on deleted=False
+            models.Index(fields=['parent'], condition=models.Q(deleted=False), name='item_parent_alive_idx'),
+            models.Index(fields=['id'], condition=models.Q(deleted=False), name='item_alive_idx'),
+            # Live containers, for the dashboard count and the move destination list
+            models.Index(
+                fields=['id'], condition=models.Q(deleted=False, is_container=True), name='item_alive_container_idx'
+            ),
             models.Index(fields=['barcode_printed_at']),
             models.Index(fields=['contents_printed_at']),
         ]
@@ -110,10 +137,30 @@ class Item(models.Model):
         status = " [DELETED]" if self.deleted else ""
         return f"{self.name} ({self.barcode_string}){status}"
 
-    @property
-    def is_container(self):
-        """Returns True if this item contains other items"""
-        return self.children.exists()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the parent the item was loaded with, so that saving a move can refresh the old parent too
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    @staticmethod
+    def has_children_exists():
+        """Returns an Exists() expression for annotating a queryset with whether each item has non-deleted children"""
+        return models.Exists(Item.objects.filter(parent_id=models.OuterRef('pk'), deleted=False))
+
+    @classmethod
+    def refresh_container_flags(cls, ids=None):
+        """
+        Recomputes is_container for the items with the given ids (None and empty ids are ignored), or for every
+        item if ids is None.  Only rows whose flag is wrong are written, and their number is returned.  Call this
+        after writes that change which items have live children but don't send signals, such as queryset
+        update() and bulk_*().
+        """
+        items = cls.objects.all()
+        if ids is not None:
+            items = items.filter(pk__in=[item_id for item_id in ids if item_id is not None])
+        return items.exclude(is_container=cls.has_children_exists()).update(is_container=cls.has_children_exists())
 
     @property
     def needs_barcode_printed(self):
@@ -128,12 +175,102 @@ class Item(models.Model):
     @property
     def path(self):
         """Returns the full location path as a string"""
+        cached_path = getattr(self, '_cached_path', None)
+        if cached_path is not None:
+            return cached_path
+        if self.deleted:
+            return "Unfiled"
+
+        # Only our ancestors are needed, so walk up from our parent rather than loading every item
+        name_parent_map = Item.ancestor_name_parent_map([self.parent_id])
+        # Prefer our own (possibly unsaved) name and parent over what's in the database
+        name_parent_map[self.id] = (self.name, self.parent_id)
+        return Item.compute_path(self.id, name_parent_map)
+
+    @classmethod
+    def ancestor_name_parent_map(cls, ids):
+        """
+        Returns a dict mapping each of the given ids, and those of all their ancestors, to (name, parent_id).
+        Deleted items are left out, and the walk up stops at them, as it does in compute_path().  This reads
+        one row per level of the tree above each item, rather than the whole table.
+        """
+        ids = [item_id for item_id in ids if item_id is not None]
+        if not ids:
+            return {}
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        placeholders = ', '.join(['%s'] * len(ids))
+        # UNION rather than UNION ALL, so shared ancestors (and any cycle) are only visited once
+        sql = f"""
+            WITH RECURSIVE ancestors(id, name, parent_id) AS (
+                SELECT id, name, parent_id FROM {table} WHERE id IN ({placeholders}) AND deleted = %s
+                UNION
+                SELECT i.id, i.name, i.parent_id FROM {table} i JOIN ancestors a ON i.id = a.parent_id
+                WHERE i.deleted = %s
+            )
+            SELECT id, name, parent_id FROM ancestors
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*ids, False, False])
+            return {item_id: (name, parent_id) for item_id, name, parent_id in cursor.fetchall()}
+
+    @staticmethod
+    def compute_path(item_id, name_parent_map):
+        """Returns the location path for item_id by walking a map of live items' (name, parent_id)"""
         path = []
-        current = self
-        while current and not current.deleted:
-            path.insert(0, current.name)
-            current = current.parent
-        return " > ".join(path) if path else "Unfiled"
+        seen = set()
+        current_id = item_id
+        while current_id in name_parent_map and current_id not in seen:
+            seen.add(current_id)
+            name, current_id = name_parent_map[current_id]
+            path.append(name)
+        return " > ".join(reversed(path)) if path else "Unfiled"
+
+    @classmethod
+    def prefetch_paths(cls, items):
+        """Precomputes .path for each of the given items using a single query over them and their ancestors"""
+        name_parent_map = cls.ancestor_name_parent_map([item.id for item in items])
+        for item in items:
+            item._cached_path = cls.compute_path(item.id, name_parent_map)
+        return items
+
+    @classmethod
+    def order_by_path(cls, items):
+        """
+        Returns the given items as a list sorted by path, with .path precomputed.  The paths are built and
+        sorted by the database in a single recursive query, rather than walked and sorted in Python.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        # Sort on a separate key whose separator sorts before any printable character, compared bytewise, so a
+        # container's contents always follow it directly.  Locale collations (PostgreSQL's usual default) skip
+        # spaces and punctuation at first, which would sort "Box > A", "Boxes" and "Box > Z" in that order.
+        collate = ' COLLATE "C"' if connection.vendor == 'postgresql' else ''  # SQLite already compares bytewise
+        # Paths start at root items, or at live items whose container has been deleted, matching Item.path
+        sql = f"""
+            WITH RECURSIVE paths(id, path, sort_key) AS (
+                SELECT id, CAST(name AS TEXT), CAST(name AS TEXT) FROM {table}
+                WHERE deleted = %s AND (parent_id IS NULL OR parent_id IN (SELECT id FROM {table} WHERE deleted = %s))
+                UNION ALL
+                SELECT i.id, p.path || ' > ' || i.name, p.sort_key || %s || i.name
+                FROM {table} i JOIN paths p ON i.parent_id = p.id
+                WHERE i.deleted = %s
+            )
+            SELECT id, path FROM paths ORDER BY sort_key{collate}
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [False, True, PATH_SORT_SEPARATOR, False])
+            rows = cursor.fetchall()
+
+        unsorted = {item.id: item for item in items}
+        ordered = []
+        for item_id, path in rows:
+            item = unsorted.pop(item_id, None)
+            if item is not None:
+                item._cached_path = path
+                ordered.append(item)
+        # Anything the query couldn't reach (e.g. deleted items) goes last
+        ordered.extend(unsorted.values())
+        return ordered
 
     @property
     def barcode_string(self):
@@ -148,14 +285,30 @@ class Item(models.Model):
 
     def soft_delete(self, reason=""):
         """Soft delete this item and all its children recursively"""
-        # Recursively soft delete all children
-        for child in self.children.all():
-            child.soft_delete(f"Parent container deleted: {reason}")
+        # Mark the whole subtree in one UPDATE.  Children get a reason pointing back at the container.
+        now = timezone.now()
+        subtree_ids = Item.descendant_ids(self.id, include_self=True)
+        Item.objects.filter(id__in=subtree_ids).update(
+            deleted=True,
+            deleted_at=now,
+            deletion_reason=models.Case(
+                models.When(pk=self.pk, then=models.Value(reason)),
+                default=models.Value(f"Parent container deleted: {reason}"),
+            ),
+            last_updated_at=now,
+        )
+        # Nothing in the subtree has live children now, and the parent may have lost its last one
+        Item.refresh_container_flags([*subtree_ids, self.parent_id])
 
         self.deleted = True
-        self.deleted_at = timezone.now()
+        self.is_container = False
+        self.deleted_at = now
         self.deletion_reason = reason
-        self.save()
+        self.last_updated_at = now
+
+        from .stats import invalidate_dash_stats
+
+        invalidate_dash_stats()
 
     def mark_barcode_printed(self):
         """Mark the item's barcode as printed"""
@@ -168,42 +321,69 @@ class Item(models.Model):
             self.contents_printed_at = timezone.now()
             self.save()
 
-    def get_all_children(self, include_self=False):
-        """Get all descendants of this item (for containers)"""
-        children = []
-        if include_self:
-            children.append(self)
+    @classmethod
+    def descendant_ids(cls, root_id, include_self=False):
+        """
+        Returns the ids of all non-deleted descendants of the item with the given id,
+        fetched with a single recursive query rather than one query per node.
+        """
+        table = connection.ops.quote_name(cls._meta.db_table)
+        sql = f"""
+            WITH RECURSIVE descendants(id) AS (
+                SELECT id FROM {table} WHERE parent_id = %s AND deleted = %s
+                UNION
+                SELECT i.id FROM {table} i JOIN descendants d ON i.parent_id = d.id WHERE i.deleted = %s
+            )
+            SELECT id FROM descendants
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [root_id, False, False])
+            ids = [row[0] for row in cursor.fetchall()]
 
-        for child in self.children.filter(deleted=False):
-            children.append(child)
-            children.extend(child.get_all_children())
+        if include_self:
+            ids.insert(0, root_id)
 
-        return children
+        return ids
 
     def get_contained_tree(self):
         """Get a tree structure of all contained items (non-deleted children only)"""
-
-        def build_tree(item):
-            tree = {'item': item, 'children': []}
-            for child in item.children.filter(deleted=False).order_by('id'):
-                tree['children'].append(build_tree(child))
-            return tree
-
-        return build_tree(self)
+        # Load the whole subtree at once, rather than querying each node's children, then assemble it in Python.
+        # The tree view shows each item's name, barcode and whether it is a container.
+        descendants = (
+            Item.objects.filter(id__in=Item.descendant_ids(self.id))
+            .only('id', 'name', 'parent', 'is_container')
+            .order_by('id')
+        )
+        nodes = {self.id: {'item': self, 'children': []}}
+        for item in descendants:
+            nodes[item.id] = {'item': item, 'children': []}
+        # Attach in id order, so every node's children are sorted by id
+        for node in list(nodes.values())[1:]:
+            nodes[node['item'].parent_id]['children'].append(node)
+
+        return nodes[self.id]
 
     def is_ancestor_of(self, other_item):
         """Check if this item is an ancestor of another item (to prevent cycles)"""
         if self == other_item:
             return True  # An item is considered its own ancestor
-
-        # Walk up the parent chain of other_item to see if we find self
-        current = other_item
-        while current and current.parent:
-            if current.parent == self:
-                return True
-            current = current.parent
-
-        return False
+        if other_item.parent_id is None:
+            return False
+
+        # Walk up the parent chain of other_item to see if we find self, in a single recursive query.  Walking up
+        # costs O(depth) rows, unlike walking down through all of self's descendants.
+        table = connection.ops.quote_name(Item._meta.db_table)
+        sql = f"""
+            WITH RECURSIVE ancestors(id) AS (
+                SELECT id FROM {table} WHERE id = %s
+                UNION
+                SELECT i.parent_id FROM {table} i JOIN ancestors a ON i.id = a.id WHERE i.parent_id IS NOT NULL
+            )
+            SELECT 1 FROM ancestors WHERE id = %s LIMIT 1
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [other_item.parent_id, self.id])
+            return cursor.fetchone() is not None
 
 
 class ExternalBarcode(models.Model):
@@ -248,7 +428,7 @@ class ExternalBarcode(models.Model):
     @staticmethod
     def guess_type_from_str(barcode_string):
         # Guess the barcode type.
-        if re.match(r'^\d{12,13}$', barcode_string):
+        if UPC_RE.match(barcode_string):
             # UPC or EAN
             return 'UPC'
         else:
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Item
+from .stats import invalidate_dash_stats
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, instance, **kwargs):
+    # The item's parent may have gained or lost a child, and so may the parent it was moved from.  The item's
+    # own flag is refreshed too, in case the save wrote back a stale in-memory value.
+    Item.refresh_container_flags({instance.pk, instance.parent_id, getattr(instance, '_loaded_parent_id', None)})
+    instance._loaded_parent_id = instance.parent_id
+    invalidate_dash_stats()
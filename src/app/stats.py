@@ -0,0 +1,30 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Item
+
+DASH_STATS_CACHE_KEY = 'dash:stats'
+DASH_STATS_CACHE_TIMEOUT = 15  # seconds
+
+
+def _compute_dash_stats():
+    # Count items and containers (items that have children) in a single pass over the live items
+    return Item.objects.filter(deleted=False).aggregate(
+        total_items=Count('pk'),
+        container_count=Count('pk', filter=Q(is_container=True)),
+    )
+
+
+def get_dash_stats():
+    """Returns the dashboard counts, from the cache if they haven't been invalidated or timed out"""
+    return cache.get_or_set(DASH_STATS_CACHE_KEY, _compute_dash_stats, DASH_STATS_CACHE_TIMEOUT)
+
+
+def invalidate_dash_stats():
+    """
+    Drops the cached dashboard counts once the current transaction commits (immediately if there isn't one).
+    Item saves and deletes do this via signals; call it directly after queryset update() or bulk_*() writes,
+    which don't send them.
+    """
+    transaction.on_commit(lambda: cache.delete(DASH_STATS_CACHE_KEY))
@@ -0,0 +1,89 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from app import importer
+from app.importer import import_items
+from app.models import Item
+
+HEADER = 'ID\tIn\tName\tDesc\n'
+
+
+@pytest.mark.django_db
+def test_import_items_with_parent_defined_later():
+    lines = [HEADER, '2\t1\tBox\t\n', '1\t-root-\tShed\tGarden\n']
+    result = import_items(lines, save=True)
+    assert result['errors'] == []
+    assert result['imported_count'] == 2
+    assert Item.objects.get(pk=2).parent_id == 1
+
+
+@pytest.mark.django_db
+def test_import_items_flags_parent_defined_in_later_batch(monkeypatch):
+    monkeypatch.setattr(importer, 'IMPORT_BATCH_SIZE', 1)
+    lines = [HEADER, '2\t1\tBox\t\n', '1\t-root-\tShed\t\n']
+    result = import_items(lines, save=True)
+    assert result['errors'] == []
+    assert Item.objects.get(pk=1).is_container
+
+
+@pytest.mark.django_db
+def test_import_items_counts_updates():
+    Item.objects.create(id=1, name='Old shed')
+    lines = [HEADER, '1\t-root-\tShed\t\n', '2\t1\tBox\t\n']
+    result = import_items(lines, save=True)
+    assert result['imported_count'] == 2
+    assert result['updated_count'] == 1
+    assert Item.objects.get(pk=1).name == 'Shed'
+
+
+@pytest.mark.django_db
+def test_import_items_rejects_missing_parent():
+    lines = [HEADER, '1\t-root-\tShed\t\n', '2\t99\tBox\t\n']
+    result = import_items(lines, save=True)
+    assert result['errors'] == ['Line 3: Parent item 99 does not exist']
+    assert result['imported_count'] == 0
+    assert not Item.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_items_updates_container_flags():
+    shed = Item.objects.create(id=1, name='Shed')
+    Item.objects.create(id=2, name='Box', parent=shed)
+    lines = [HEADER, '3\t-root-\tGarage\t\n', '2\t3\tBox\t\n']
+    result = import_items(lines, save=True)
+    assert result['errors'] == []
+    assert not Item.objects.get(pk=1).is_container
+    assert Item.objects.get(pk=3).is_container
+
+
+@pytest.fixture
+def import_file(tmp_path):
+    path = tmp_path / 'items.tsv'
+    path.write_text(HEADER + '1\t-root-\tShed\t\n2\t1\tBox\t\n', encoding='utf-8')
+    return path
+
+
+@pytest.mark.django_db
+def test_import_items_command(import_file):
+    out = StringIO()
+    call_command('import_items', str(import_file), stdout=out)
+    assert 'Imported 2 items (2 new, 0 updated)' in out.getvalue()
+    assert Item.objects.get(pk=2).parent_id == 1
+
+
+@pytest.mark.django_db
+def test_import_items_command_dry_run(import_file):
+    out = StringIO()
+    call_command('import_items', str(import_file), '--dry-run', stdout=out)
+    assert '2 valid items (1 root, 1 child)' in out.getvalue()
+    assert not Item.objects.exists()
+
+
+@pytest.mark.django_db
+def test_import_items_command_reports_errors(tmp_path):
+    path = tmp_path / 'items.tsv'
+    path.write_text(HEADER + '2\t99\tBox\t\n', encoding='utf-8')
+    with pytest.raises(CommandError, match='Parent item 99 does not exist'):
+        call_command('import_items', str(path))
@@ -0,0 +1,152 @@
+import pytest
+
+from app.models import Item
+
+
+@pytest.fixture(scope='function')
+def tree(db):
+    """shed > shelf > box > widget, plus a deleted bin on the shelf"""
+    shed = Item.objects.create(name='Shed')
+    shelf = Item.objects.create(name='Shelf', parent=shed)
+    box = Item.objects.create(name='Box', parent=shelf)
+    widget = Item.objects.create(name='Widget', parent=box)
+    old_bin = Item.objects.create(name='Bin', parent=shelf, deleted=True)
+    return {'shed': shed, 'shelf': shelf, 'box': box, 'widget': widget, 'bin': old_bin}
+
+
+def test_descendant_ids(tree):
+    ids = Item.descendant_ids(tree['shed'].id)
+    assert sorted(ids) == sorted([tree['shelf'].id, tree['box'].id, tree['widget'].id])
+
+
+def test_descendant_ids_include_self(tree):
+    ids = Item.descendant_ids(tree['box'].id, include_self=True)
+    assert sorted(ids) == sorted([tree['box'].id, tree['widget'].id])
+
+
+def test_descendant_ids_of_leaf(tree):
+    assert Item.descendant_ids(tree['widget'].id) == []
+
+
+def test_path(tree):
+    assert tree['widget'].path == 'Shed > Shelf > Box > Widget'
+    assert tree['shed'].path == 'Shed'
+
+
+def test_path_reads_only_ancestors(tree, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        assert tree['box'].path == 'Shed > Shelf > Box'
+    # A root item has no ancestors to look up
+    with django_assert_num_queries(0):
+        assert tree['shed'].path == 'Shed'
+
+
+def test_path_stops_at_deleted_container(tree):
+    lid = Item.objects.create(name='Lid', parent=tree['bin'])
+    assert lid.path == 'Lid'
+
+
+def test_path_of_deleted_item(tree):
+    assert tree['bin'].path == 'Unfiled'
+
+
+def test_is_ancestor_of(tree):
+    assert tree['shed'].is_ancestor_of(tree['widget'])
+    assert tree['box'].is_ancestor_of(tree['box'])
+    assert not tree['widget'].is_ancestor_of(tree['shed'])
+    assert not tree['bin'].is_ancestor_of(tree['widget'])
+
+
+def test_soft_delete(tree):
+    tree['shelf'].soft_delete('Rotten')
+
+    shelf = Item.objects.get(pk=tree['shelf'].pk)
+    widget = Item.objects.get(pk=tree['widget'].pk)
+    assert shelf.deleted and shelf.deletion_reason == 'Rotten'
+    assert widget.deleted and widget.deletion_reason == 'Parent container deleted: Rotten'
+    assert not Item.objects.get(pk=tree['shed'].pk).deleted
+
+
+def test_prefetch_paths(tree, django_assert_num_queries):
+    items = list(Item.objects.filter(deleted=False))
+    with django_assert_num_queries(1):
+        Item.prefetch_paths(items)
+        paths = {item.name: item.path for item in items}
+    assert paths['Widget'] == 'Shed > Shelf > Box > Widget'
+    assert paths['Shelf'] == 'Shed > Shelf'
+
+
+@pytest.mark.parametrize(
+    'barcode, expected',
+    [('T=42', '42'), ('T=', None), ('T=4x2', None), ('X=42', None), ('42', None)],
+)
+def test_get_possible_item_id_from_internal_barcode(settings, barcode, expected):
+    settings.BARCODE_PREFIX = 'T='
+    assert Item.get_possible_item_id_from_internal_barcode(barcode) == expected
+
+
+def test_is_container_follows_children(tree):
+    containers = set(Item.objects.filter(is_container=True).values_list('name', flat=True))
+    assert containers == {'Shed', 'Shelf', 'Box'}
+
+    # Moving the widget out empties the box
+    widget = Item.objects.get(pk=tree['widget'].pk)
+    widget.parent = tree['shed']
+    widget.save()
+    assert not Item.objects.get(pk=tree['box'].pk).is_container
+
+    # Deleting the shelf's subtree leaves it with no live children
+    tree['shelf'].soft_delete('Rotten')
+    containers = set(Item.objects.filter(is_container=True).values_list('name', flat=True))
+    assert containers == {'Shed'}
+
+
+def test_refresh_container_flags_only_writes_stale_rows(tree):
+    assert Item.refresh_container_flags() == 0
+    Item.objects.filter(pk=tree['box'].pk).update(is_container=False)
+    assert Item.refresh_container_flags([tree['box'].id, tree['widget'].id]) == 1
+    assert Item.objects.get(pk=tree['box'].pk).is_container
+
+
+def test_order_by_path(tree):
+    items = Item.order_by_path(Item.objects.filter(deleted=False))
+    assert [item.path for item in items] == [
+        'Shed',
+        'Shed > Shelf',
+        'Shed > Shelf > Box',
+        'Shed > Shelf > Box > Widget',
+    ]
+
+
+def test_order_by_path_keeps_contents_together(db):
+    box = Item.objects.create(name='Box')
+    Item.objects.create(name='Z', parent=box)
+    Item.objects.create(name='A', parent=box)
+    Item.objects.create(name='Boxes')
+    Item.objects.create(name='Box (old)')
+    items = Item.order_by_path(Item.objects.all())
+    assert [item.path for item in items] == ['Box', 'Box > A', 'Box > Z', 'Box (old)', 'Boxes']
+
+
+def test_get_contained_tree(tree, django_assert_max_num_queries):
+    with django_assert_max_num_queries(2):
+        contained = tree['shed'].get_contained_tree()
+        names = []
+        node = contained
+        while node['children']:
+            assert len(node['children']) == 1
+            node = node['children'][0]
+            names.append((node['item'].name, node['item'].is_container))
+    assert contained['item'] == tree['shed']
+    assert names == [('Shelf', True), ('Box', True), ('Widget', False)]
+
+
+def test_from_any_barcode(tree, settings, django_assert_num_queries):
+    settings.BARCODE_PREFIX = 'T='
+    tree['box'].external_barcodes.create(code='012345678905')
+    with django_assert_num_queries(1):
+        assert Item.from_any_barcode('012345678905') == tree['box']
+    with django_assert_num_queries(1):
+        assert Item.from_any_barcode(f"T={tree['widget'].id}") == tree['widget']
+    assert Item.from_any_barcode(f"T={tree['bin'].id}") is None
+    assert Item.from_any_barcode('nothing') is None
@@ -1,8 +1,22 @@
 import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from pytest_django.asserts import assertRedirects, assertTemplateUsed
 
+from app.models import Item
+from app.views import ITEMS_PER_PAGE
+
+
+@pytest.fixture
+def user_client(client, django_user_model):
+    """A client logged in as an ordinary user."""
+    user = django_user_model.objects.create_user(email='user@example.com', password='secret123')
+    client.force_login(user)
+    return client
+
 
 def test_top_anonymous(client):
     """Top page is accessible without authentication."""
@@ -95,3 +109,162 @@ def test_logout_success(client, django_user_model):
     assertRedirects(response, reverse('top'))
     # After logout, the top page should show the login link again
     assert b'Log in' in response.content
+
+
+def test_item_list_paginates(user_client, django_assert_max_num_queries):
+    """The item list shows one page, with paths looked up for that page's items only."""
+    shed = Item.objects.create(name='Shed')
+    for n in range(ITEMS_PER_PAGE + 5):
+        Item.objects.create(name=f'Thing {n}', parent=shed)
+    # Session, user, count, page and paths, however many items there are
+    with django_assert_max_num_queries(6):
+        response = user_client.get(reverse('app:item_list'), {'page': 2})
+    assert response.status_code == 200
+    page_obj = response.context['page_obj']
+    assert page_obj.number == 2
+    assert len(page_obj) == 6
+    # The shed is first on page 1, so page 2 starts at thing 49
+    expected = [f'Shed > Thing {n}' for n in range(ITEMS_PER_PAGE - 1, ITEMS_PER_PAGE + 5)]
+    assert [item.path for item in page_obj] == expected
+
+
+def test_item_detail_paths(user_client, django_assert_max_num_queries):
+    """The detail page shows its paths without reading unrelated items."""
+    shed = Item.objects.create(name='Shed')
+    shelf = Item.objects.create(name='Shelf', parent=shed)
+    box = Item.objects.create(name='Box', parent=shelf)
+    Item.objects.create(name='Widget', parent=box)
+    old_shelf = Item.objects.create(name='Old shelf', parent=shed)
+    Item.objects.filter(pk=box.pk).update(previously_in=old_shelf)
+    # Session, user, item, barcodes, paths, the contents tree (two) and history
+    with django_assert_max_num_queries(8):
+        response = user_client.get(reverse('app:item_detail', kwargs={'pk': box.pk}))
+    assert response.status_code == 200
+    item = response.context['item']
+    assert item.path == 'Shed > Shelf > Box'
+    assert item.parent.path == 'Shed > Shelf'
+    assert item.previously_in.path == 'Shed > Old shelf'
+
+
+def test_scan_verb_prefixed_external_barcode_is_an_action(user_client, settings):
+    """Action barcodes are recognised before any lookup, so an external barcode like one can't find its item."""
+    settings.BARCODE_VERB_PREFIX = 'V='
+    item = Item.objects.create(name='Widget')
+    item.external_barcodes.create(code='V=MOVE')
+    response = user_client.get(reverse('app:scan_redirect'), {'barcode': 'V=MOVE'})
+    # Taken as the move action, which needs a previously scanned item
+    assert response.status_code == 400
+
+
+def test_new_item_forgets_deleted_last_parent(user_client, settings):
+    """A remembered parent that has since been deleted is dropped from the session, not pre-selected."""
+    settings.BARCODE_PREFIX = 'T='
+    shelf = Item.objects.create(name='Shelf', deleted=True)
+    session = user_client.session
+    session['last_used_parent_id'] = shelf.id
+    session.save()
+    response = user_client.get(reverse('app:new_item'), {'barcode': 'T=999'})
+    assert response.status_code == 200
+    assert response.context['form'].initial.get('parent') is None
+    assert 'last_used_parent_id' not in user_client.session
+
+
+def test_new_item_preselects_last_parent(user_client, settings):
+    settings.BARCODE_PREFIX = 'T='
+    shelf = Item.objects.create(name='Shelf')
+    session = user_client.session
+    session['last_used_parent_id'] = shelf.id
+    session.save()
+    response = user_client.get(reverse('app:new_item'), {'barcode': 'T=999'})
+    assert response.status_code == 200
+    assert response.context['form'].initial['parent'] == shelf.id
+
+
+@pytest.fixture
+def scan_settings(settings):
+    """Known barcode prefixes, and no scan throttling left over from other tests."""
+    settings.BARCODE_PREFIX = 'T='
+    settings.BARCODE_VERB_PREFIX = 'V='
+    cache.clear()
+    return settings
+
+
+def scan(client, code):
+    return client.get(reverse('app:scan_redirect'), {'barcode': code})
+
+
+def test_scan_internal_barcode(user_client, scan_settings):
+    """Scanning an item records the scan and remembers the item for actions."""
+    item = Item.objects.create(name='Widget')
+    response = scan(user_client, item.barcode_string)
+    assertRedirects(response, item.get_absolute_url(), fetch_redirect_response=False)
+    assert Item.objects.get(pk=item.pk).last_scanned_at is not None
+    assert user_client.session['last_scanned_item_id'] == item.id
+
+
+def test_scan_repeat_within_interval_does_not_write(user_client, scan_settings):
+    item = Item.objects.create(name='Widget')
+    scan(user_client, item.barcode_string)
+    first_scanned_at = Item.objects.get(pk=item.pk).last_scanned_at
+
+    scan(user_client, item.barcode_string)
+    assert Item.objects.get(pk=item.pk).last_scanned_at == first_scanned_at
+
+    # Once the interval is over (here, its cache key has expired), the next scan is recorded
+    cache.delete(f'scan:{item.pk}')
+    scan(user_client, item.barcode_string)
+    assert Item.objects.get(pk=item.pk).last_scanned_at > first_scanned_at
+
+
+def test_scan_action_after_item(user_client, scan_settings):
+    item = Item.objects.create(name='Widget')
+    scan(user_client, item.barcode_string)
+    response = scan(user_client, 'V=MOVE')
+    expected = reverse('app:item_action', kwargs={'pk': item.pk, 'action': 'move'})
+    assertRedirects(response, expected, fetch_redirect_response=False)
+
+
+def test_scan_action_without_item(user_client, scan_settings):
+    response = scan(user_client, 'V=MOVE')
+    assert response.status_code == 400
+
+
+def test_scan_action_name_with_digit(user_client, scan_settings):
+    """Action names are only lowercase letters and underscores, so anything else is not found."""
+    item = Item.objects.create(name='Widget')
+    scan(user_client, item.barcode_string)
+    response = scan(user_client, 'V=MOVE2')
+    assert response.status_code == 404
+
+
+def test_scan_unknown_internal_barcode(user_client, scan_settings):
+    response = scan(user_client, 'T=999')
+    expected = reverse('app:new_item', query={'barcode': 'T=999'})
+    assertRedirects(response, expected, fetch_redirect_response=False)
+
+
+def test_scan_search(user_client, scan_settings):
+    """A search is recognised by its prefix, without looking for an item."""
+    with CaptureQueriesContext(connection) as queries:
+        response = scan(user_client, '/red box')
+    assert not [query['sql'] for query in queries if Item._meta.db_table in query['sql']]
+    expected = reverse('app:item_list', query={'q': 'red box'})
+    assertRedirects(response, expected, fetch_redirect_response=False)
+
+
+def test_move_item(user_client, scan_settings):
+    """Moving an item updates both ends of the move, including which items are containers."""
+    shelf = Item.objects.create(name='Shelf')
+    box = Item.objects.create(name='Box')
+    widget = Item.objects.create(name='Widget', parent=shelf)
+    url = reverse('app:item_action', kwargs={'pk': widget.pk, 'action': 'move'})
+    response = user_client.post(url, {'barcode': box.barcode_string})
+    assertRedirects(response, widget.get_absolute_url(), fetch_redirect_response=False)
+
+    widget = Item.objects.get(pk=widget.pk)
+    assert widget.parent_id == box.id
+    assert widget.previously_in_id == shelf.id
+    box = Item.objects.get(pk=box.pk)
+    assert box.last_scanned_at is not None
+    assert box.is_container
+    assert not Item.objects.get(pk=shelf.pk).is_container
@@ -1,13 +1,28 @@
-from django.urls import path
+from django.urls import path, register_converter
 from . import actions, views
 
 app_name = 'app'
 
+
+class ActionNameConverter:
+    """Matches action names as registered by actions.action: lowercase letters and underscores"""
+
+    regex = '[a-z_]+'
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(ActionNameConverter, 'action')
+
 urlpatterns = [
     path('', views.inventory_dashboard, name='dash'),
     path('partials/dash-stats/', views.dash_stats, name='dash_stats'),
     path('item/', views.item_list, name='item_list'),
-    path('item/<int:pk>/<slug:action>/', actions.handle_action, name='item_action'),
+    path('item/<int:pk>/<action:action>/', actions.handle_action, name='item_action'),
     path('item/<int:pk>/', views.item_detail, name='item_detail'),
     path('item/new/', views.new_item, name='new_item'),
     path('scan/', views.scan_redirect, name='scan_redirect'),
@@ -1,20 +1,26 @@
-import csv
 import re
-from datetime import datetime, timedelta
+from datetime import timedelta
 from io import StringIO
-from urllib.parse import urlencode
-from zoneinfo import ZoneInfo
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_not_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.http import Http404, HttpResponseBadRequest, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
 
+from . import importer
 from .forms import CSVImportForm, ItemCreateForm
 from .models import ExternalBarcode, Item
+from .stats import get_dash_stats
+
+ITEMS_PER_PAGE = 50
+SCAN_WRITE_INTERVAL = 10  # seconds; repeat scans of an item within this long don't update last_scanned_at
+LCSC_PART_RE = re.compile(r'pc:(C\d+),')  # LCSC part number within an LCSC reel/bag barcode
 
 
 #@login_not_required
@@ -25,11 +31,7 @@ def inventory_dashboard(request):
 
 def dash_stats(request):
     """HTMX endpoint for dashboard statistics"""
-    total_items = Item.objects.filter(deleted=False).count()
-    # Count containers (items that have children)
-    container_count = Item.objects.filter(deleted=False, children__isnull=False).distinct().count()
-    context = {'total_items': total_items, 'container_count': container_count}
-    return render(request, 'app/dash.html#dash-stats-cards', context)
+    return render(request, 'app/dash.html#dash-stats-cards', get_dash_stats())
 
 
 def scan_redirect(request):
@@ -40,74 +42,86 @@ def scan_redirect(request):
     if not code:
         raise Http404("No barcode provided")
 
-    if item := Item.from_any_barcode(code):
-        # If either way we found an item, redirect to its detail page
-        # Update last_scanned_at timestamp with UTC datetime
-        item.last_scanned_at = datetime.now(ZoneInfo('UTC'))
-        item.save()
-        # Store the scanned item ID in session for action views
-        # FIXME: Ditch use of session by modifying the scan barcode text input form to have a hidden field
-        # for the last scanned barcode, if and only if the last thing we scanned was a valid barcode.
-        request.session['last_scanned_item_id'] = item.id
-        return redirect(item)
-
-    # So we don't have an item.  Check if this is an action barcode (e.g., V=AUDIT)
-    action_match = re.match(f"^{re.escape(settings.BARCODE_VERB_PREFIX)}(.+)$", code)
-    if action_match:
-        action_name = action_match.group(1).lower()
+    # Classify the code once, by its prefix.  Action barcodes and searches are handled first, so they don't
+    # cost an item lookup.  This means an external barcode starting with BARCODE_VERB_PREFIX or '/' is always
+    # taken as an action or a search, and can't be used to find its item.
+    verb_prefix = settings.BARCODE_VERB_PREFIX
+    if code.startswith(verb_prefix) and len(code) > len(verb_prefix):
+        # This is an action barcode (e.g., V=AUDIT)
+        action_name = code[len(verb_prefix) :].lower()
         id_of_last_scanned_item = request.session.get('last_scanned_item_id')
         if id_of_last_scanned_item:
+            # Verify the item exists, without loading it
+            if not Item.objects.filter(id=id_of_last_scanned_item).exists():
+                raise Http404(f"Item {id_of_last_scanned_item} for action '{action_name}' not found")
             try:
-                # Verify the item exists
-                Item.objects.get(id=id_of_last_scanned_item)
                 # Redirect to the action URL instead of calling the function directly
                 url = reverse('app:item_action', kwargs={"pk": id_of_last_scanned_item, "action": action_name})
-                return redirect(url)
-            except Item.DoesNotExist:
-                raise Http404(f"Item {id_of_last_scanned_item} for action '{action_name}' not found")
+            except NoReverseMatch:
+                # Action URLs only accept names made of lowercase letters and underscores
+                raise Http404(f"Action '{action_name}' not found")
+            # Already a URL, so there's no need for redirect() to try reversing it
+            return HttpResponseRedirect(url)
         # No last scanned item found - return 400 Bad Request
         return HttpResponseBadRequest(f"Action '{action_name}' requires a previously scanned item")
 
+    # Perhaps it's a search (starts with '/'), which also needn't look for an item
+    if code.startswith('/'):
+        query = code[1:]  # Strip leading '/'
+        url = reverse('app:item_list', query={'q': query})
+        return HttpResponseRedirect(url)
+
+    # The internal id is parsed just once: it's used for the lookup, and again below if there's no such item yet.
+    # Internal codes are only ever looked up by id, and anything else by external barcode.
+    internal_id = Item.get_possible_item_id_from_internal_barcode(code)
+    if internal_id:
+        item = Item.from_internal_id(internal_id)
+    else:
+        item = Item.from_external_barcode(code)
+
+    if item:
+        # If either way we found an item, redirect to its detail page
+        # Update last_scanned_at with a single-column UPDATE rather than rewriting the whole row.  cache.add()
+        # only succeeds for the first scan in each interval, so a burst of scans of one item costs one write.
+        if cache.add(f'scan:{item.pk}', True, SCAN_WRITE_INTERVAL):
+            Item.objects.filter(pk=item.pk).update(last_scanned_at=timezone.now())
+        # Store the scanned item ID in session for action views, only assigning it if it changed, so that
+        # rescanning the same item doesn't save the session again
+        # FIXME: Ditch use of session by modifying the scan barcode text input form to have a hidden field
+        # for the last scanned barcode, if and only if the last thing we scanned was a valid barcode.
+        if request.session.get('last_scanned_item_id') != item.id:
+            request.session['last_scanned_item_id'] = item.id
+        return redirect(item)
+
     # Perhaps it's a barcode in our internal format, but we've never seen it before
-    if Item.get_possible_item_id_from_internal_barcode(code):
+    if internal_id:
         # Redirect to new item page with this ID pre-filled
         url = reverse('app:new_item', query={'barcode': code})
         return HttpResponseRedirect(url)
 
-    # Perhaps it's a search (starts with '/')
-    if code.startswith('/'):
-        query = code[1:]  # Strip leading '/'
-        url = reverse('app:item_list') + '?' + urlencode({'q': query})
-        return HttpResponseRedirect(url)
-
     # Perhaps it's an external barcode we haven't seen before for an existing item
     url = reverse('app:new_external_barcode', query={'barcode': code})
     return HttpResponseRedirect(url)
 
 
-def item_action(request, pk, action_name):
-    """Generic handler for item actions."""
-    action_func = _action_registry.get(action_name)
-    if action_func:
-        return action_func(request, pk)
-    raise Http404(f"Action '{action_name}' not found")
-
-
 # FIXME: Candidates for moving to actions.py?
 def create_new_external_barcodes_for_item(item, external_barcodes_text):
     """Helper function to create ExternalBarcode objects from textarea input"""
-    barcodes = [b.strip() for b in external_barcodes_text.split('\n') if b.strip()]
+    # dict.fromkeys() drops repeated lines while keeping their order
+    barcodes = list(dict.fromkeys(b.strip() for b in external_barcodes_text.split('\n') if b.strip()))
     with transaction.atomic():
-        for barcode_value in barcodes:
-            if item.external_barcodes.filter(code=barcode_value).exists():
-                continue  # Skip existing barcodes
-            data = {
-                'code': barcode_value,
-                'item': item,
-                'barcode_type': ExternalBarcode.guess_type_from_str(barcode_value),
-            }
-            external_barcode_object = ExternalBarcode(**data)
-            external_barcode_object.save()
+        # Skip existing barcodes, found with one query rather than one per barcode
+        existing = set(item.external_barcodes.filter(code__in=barcodes).values_list('code', flat=True))
+        new_barcodes = [
+            ExternalBarcode(
+                code=barcode_value,
+                item=item,
+                barcode_type=ExternalBarcode.guess_type_from_str(barcode_value),
+            )
+            for barcode_value in barcodes
+            if barcode_value not in existing
+        ]
+        ExternalBarcode.objects.bulk_create(new_barcodes, ignore_conflicts=True)
 
 
 def new_item(request):
@@ -130,7 +144,7 @@ def new_item(request):
         if form.is_valid():
             with transaction.atomic():
                 item = form.save(commit=False)
-                item.last_scanned_at = datetime.now(ZoneInfo('UTC'))
+                item.last_scanned_at = timezone.now()
                 # Here's where we patch in the id so it doesn't have an existing one
                 item.pk = possible_new_id
                 item.save()
@@ -139,9 +153,9 @@ def new_item(request):
                 parent = form.cleaned_data.get('parent')
                 if parent:
                     request.session['last_used_parent_id'] = parent.id
-                elif 'last_used_parent_id' in request.session:
+                else:
                     # If no parent selected, remove the stored parent
-                    del request.session['last_used_parent_id']
+                    request.session.pop('last_used_parent_id', None)
 
                 # Handle external barcodes from the textarea
                 external_barcodes_text = form.cleaned_data.get('external_barcodes', '').strip()
@@ -161,13 +175,12 @@ def new_item(request):
         # Set parent from session if available
         last_parent_id = request.session.get('last_used_parent_id')
         if last_parent_id:
-            try:
-                last_parent = Item.objects.get(id=last_parent_id, deleted=False)
-                initial_data['parent'] = last_parent
-            except Item.DoesNotExist:
+            # The parent select only needs the id, so just check the item is still there
+            if Item.objects.filter(id=last_parent_id, deleted=False).exists():
+                initial_data['parent'] = last_parent_id
+            else:
                 # If the parent no longer exists, remove it from session
-                if 'last_used_parent_id' in self.request.session:
-                    del request.session['last_used_parent_id']
+                request.session.pop('last_used_parent_id', None)
 
         form = ItemCreateForm(initial=initial_data)
 
@@ -200,13 +213,13 @@ def new_external_barcode(request):
             return HttpResponseBadRequest("Item not found")
 
         create_new_external_barcodes_for_item(item, external_barcode_str)
-        item.last_scanned_at = datetime.now(ZoneInfo('UTC'))
-        item.save()
+        # The item's barcode was just scanned; record that without rewriting the whole row
+        Item.objects.filter(pk=item.pk).update(last_scanned_at=timezone.now())
 
         return redirect(item)
 
     lcsc = None
-    match = re.search(r'pc:(C\d+),', external_barcode_str)
+    match = LCSC_PART_RE.search(external_barcode_str)
     if match:
         lcsc = match.group(1)  # Extract LCSC part
 
@@ -221,17 +234,30 @@ def new_external_barcode(request):
 def item_list(request):
     query = request.GET.get('q', '').strip()
 
-    items = Item.objects.filter(deleted=False).select_related('parent').order_by('id')
+    items = (
+        Item.objects.filter(deleted=False)
+        .select_related('parent')
+        # Only the columns the list shows
+        .only('id', 'name', 'description', 'created_at', 'deleted', 'is_container', 'parent', 'parent__name')
+        .order_by('id')
+    )
     if query:
+        # Matching barcodes are checked with a subquery, so items needn't be joined to them and de-duplicated
+        barcode_matches = ExternalBarcode.objects.filter(item=OuterRef('pk'), code__icontains=query)
         filter = Q(name__icontains=query)
         filter |= Q(description__icontains=query)
-        filter |= Q(external_barcodes__code__icontains=query)
-        items = items.filter(filter).distinct()
+        filter |= Q(Exists(barcode_matches))
+        items = items.filter(filter)
+
+    page_obj = Paginator(items, ITEMS_PER_PAGE).get_page(request.GET.get('page'))
+    # Evaluates just this page; the template reuses the same instances with their paths filled in
+    Item.prefetch_paths(page_obj)
 
     title = 'Search' if query else 'All Items'
 
     context = {
-        'items': items,
+        'items': page_obj,
+        'page_obj': page_obj,
         'q': query,
         'title': title,
         'barcode_value': f'/{query}' if query else '',
@@ -242,7 +268,12 @@ def item_list(request):
 
 def item_detail(request, pk):
     """Display details for a specific item"""
-    item = get_object_or_404(Item, pk=pk)
+    item = get_object_or_404(
+        Item.objects.select_related('parent', 'previously_in').prefetch_related('external_barcodes'), pk=pk
+    )
+    # The page shows our path and those of our parent and previous container.  Compute them from one query
+    # that reads only these items and their ancestors.
+    Item.prefetch_paths([related for related in (item, item.parent, item.previously_in) if related])
     tree_structure = item.get_contained_tree() if item.is_container else None
     updated_when_scanned = (
         item.last_scanned_at is not None
@@ -259,7 +290,6 @@ def item_detail(request, pk):
 
 def import_items(request):
     """Handle CSV import of items"""
-    # FIXME: Move this to a separate file, e.g., import_items.py
     if request.method == 'POST':
         form = CSVImportForm(request.POST)
         ctx = {'form': form}
@@ -270,107 +300,39 @@ def import_items(request):
             ctx['csv_data'] = csv_data
 
             try:
-                # Parse CSV data
-                reader = csv.DictReader(StringIO(csv_data), delimiter='\t')
-
-                # Validate headers
-                expected_headers = {'ID', 'In', 'Name', 'Desc'}
-                actual_headers = set(reader.fieldnames)
-                if not expected_headers.issubset(actual_headers):
-                    form.add_error(
-                        'csv_data', f"Missing required headers: {', '.join(expected_headers - actual_headers)}"
-                    )
-                    return render(request, 'app/import.html', {'form': form})
-
-                # Process and validate each row
-                validated_items = []
-                errors = []
-                last_parent = None
-                total_items = 0
-                root_items = 0
-                child_items = 0
-                created_count = 0
-
-                with transaction.atomic():
-                    for i, row in enumerate(reader):
-                        n = i + 2  # Account for header row
-                        # Map CSV fields to model fields
-                        mapper = {'ID': 'id', 'Name': 'name', 'Desc': 'description', 'In': 'parent_id'}
-                        print(f'{row=}')
-
-                        data = {v: (row[k] if row[k] else '').strip() for k, v in mapper.items()}
-
-                        if not data['name'].strip():
-                            continue  # Skip rows without a name
-
-                        # Determine parent based on 'In' field
-                        in_field = data['parent_id']
-                        parent = None
-                        if in_field == '-root-':
-                            parent = None
-                            last_parent = None
-                        elif in_field.isdigit():
-                            parent = in_field
-                            last_parent = parent
-                        elif not in_field:
-                            parent = last_parent
-                        else:
-                            errors.append(f"Line {n}: Invalid 'In' field value: {in_field}")
-                            continue
-
-                        # Update parent in data
-                        data['parent_id'] = parent
-
-                        validated_items.append(data)
-                        total_items += 1
-                        if data['parent_id']:
-                            child_items += 1
-                        else:
-                            root_items += 1
-                        if save_requested:
-                            # If save was requested, save the items
-                            try:
-                                item = Item.objects.get(pk=data['id'])
-                            except Item.DoesNotExist:
-                                item = Item()
-                                item.id = data['id']
-                            for k, v in data.items():
-                                if k != 'id':
-                                    setattr(item, k, v)
-                            item.save()
-                            created_count += 1
-
-                    if errors:
-                        if save_requested:
-                            transaction.set_rollback(True)
-
-                        # Show errors and allow correction
-                        ctx['errors'] = errors
-                    else:
-                        # All validation passed
-                        ctx['validated_items'] = validated_items
-                        ctx['stats'] = {
-                            'total_items': total_items,
-                            'root_items': root_items,
-                            'child_items': child_items,
-                        }
-                        ctx['save'] = True
-
-                        if save_requested:
-                            # Redirect to item list with success message
-                            msg = {
-                                'message': f'Successfully imported {created_count} items',
-                                'message_type': 'success',
-                            }
-                            url = reverse('app:item_list', query=msg)
-                            return redirect(url)
-
-                return render(request, 'app/import.html', ctx)
-
+                result = importer.import_items(StringIO(csv_data), save=save_requested)
+            except importer.MissingHeadersError as e:
+                form.add_error('csv_data', str(e))
+                return render(request, 'app/import.html', {'form': form})
             except Exception as e:
                 form.add_error('csv_data', f"Error parsing CSV: {e}")
                 return render(request, 'app/import.html', ctx)
 
+            if result['errors']:
+                # Show errors and allow correction
+                ctx['errors'] = result['errors']
+            else:
+                # All validation passed
+                ctx['validated_items'] = result['validated_items']
+                ctx['stats'] = result['stats']
+                ctx['save'] = True
+
+                if save_requested:
+                    # Redirect to item list with success message
+                    imported_count = result['imported_count']
+                    updated_count = result['updated_count']
+                    msg = {
+                        'message': (
+                            f'Successfully imported {imported_count} items '
+                            f'({imported_count - updated_count} new, {updated_count} updated)'
+                        ),
+                        'message_type': 'success',
+                    }
+                    url = reverse('app:item_list', query=msg)
+                    return HttpResponseRedirect(url)
+
+            return render(request, 'app/import.html', ctx)
+
         # Form is invalid
         return render(request, 'app/import.html', ctx)
 
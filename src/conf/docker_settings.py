@@ -35,8 +35,14 @@ ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost').split(',')
 # PATH_INFO at the uWSGI level, so Django never sees the prefix.
 SCRIPT_NAME = os.environ.get('SCRIPT_NAME', '')
 
+# Keep database connections open between requests instead of reconnecting for each one.  Health checks
+# replace a connection that has gone away (e.g. after a database restart) before it is reused.
 DATABASES = {
-    'default': dj_database_url.config(default=f'sqlite:////data/db/db.sqlite3'),
+    'default': dj_database_url.config(
+        default=f'sqlite:////data/db/db.sqlite3',
+        conn_max_age=600,
+        conn_health_checks=True,
+    ),
 }
 
 STATIC_ROOT = '/app/static'